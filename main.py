@@ -1,50 +1,276 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 import argparse
 import asyncio
+import os
 import re
 import sys
 import urllib.parse
 from dataclasses import dataclass
-from typing import Literal, Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Coroutine, Literal, Optional, TypeVar
+
+import httpx
+from async_lru import alru_cache
+from resiliparse.extract.html2text import extract_plain_text
+from selectolax.lexbor import LexborHTMLParser
+
+# Playwright and trafilatura take over 100ms to import, so they are only
+# imported by the code paths that use them
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page, Playwright, Route
+
+# Fetched content can additionally be persisted across runs with diskcache by
+# pointing FETCH_CACHE_DIR at a directory
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+T = TypeVar("T")
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+# Pages extracting to less text than this are assumed to render client-side
+MIN_STATIC_TEXT_LENGTH = 500
+
+_JS_SHELL_RE = re.compile(
+    r"<noscript[^>]*>[^<]*(?:enable|requires?)\s+javascript", re.IGNORECASE
+)
+
+# How long fetched content stays cached, in seconds
+CACHE_TTL = 3600
+
+# Seconds allowed for a whole fetch, static attempt and browser fallback
+# included, so one slow page cannot stall callers fetching several
+FETCH_TIMEOUT = 30
+
+# Dates in result snippets: "Jan 5, 2024", "2024-01-05" or "05/01/2024".
+# Anchoring on a word boundary keeps the \w+ branch from being retried at
+# every position inside each word of a snippet without a date
+_DATE_RE = re.compile(r"\b(\w+ \d+, \d{4}|\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4})")
+
+# Resource types that never contribute to extracted text
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+# Serializes the DOM without elements that carry no readable text
+STRIPPED_CONTENT_JS = """
+() => {
+    document
+        .querySelectorAll("script, style, noscript, iframe, svg")
+        .forEach((e) => e.remove());
+    return document.documentElement.outerHTML;
+}
+"""
+
+# Pages opened in the shared fetch context before it is replaced, which bounds
+# the memory held by its cache and storage
+CONTEXT_MAX_PAGES = 100
+
+_playwright: Optional[Playwright] = None
+_browsers: dict[bool, Browser] = {}
+_browser_lock = asyncio.Lock()
+_fetch_context: Optional[BrowserContext] = None
+_fetch_context_pages = 0
+_fetch_context_lock = asyncio.Lock()
+
+
+async def get_browser(headless: bool = True) -> Browser:
+    """Return a shared Chromium instance, launching it on first use.
+
+    Launching Chromium is far more expensive than opening a context, so one
+    browser per headless mode is kept alive and reused across calls.
+
+    Args:
+        headless: Whether the browser should run in headless mode
+
+    Returns:
+        A connected Playwright Browser
+    """
+    from playwright.async_api import async_playwright
+
+    global _playwright
+    async with _browser_lock:
+        browser = _browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            browser = await _playwright.chromium.launch(headless=headless)
+            _browsers[headless] = browser
+        return browser
+
+
+async def close_browsers() -> None:
+    """Close all shared browsers and stop Playwright."""
+    global _playwright, _fetch_context
+    _fetch_context = None
+    async with _browser_lock:
+        for browser in _browsers.values():
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"Error closing browser: {e}", file=sys.stderr)
+        _browsers.clear()
+        if _playwright is not None:
+            await _playwright.stop()
+            _playwright = None
+
+
+async def block_resources(
+    context: BrowserContext, resource_types: frozenset[str] = BLOCKED_RESOURCE_TYPES
+) -> None:
+    """Abort requests for the given resource types in a browser context.
 
-import trafilatura
-from playwright.async_api import async_playwright
+    Args:
+        context: The browser context to install the request filter on
+        resource_types: Playwright resource types to abort
+    """
+
+    async def handle(route: Route) -> None:
+        if route.request.resource_type in resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
 
+    await context.route("**/*", handle)
+
+
+async def new_fetch_page() -> Page:
+    """Open a page in the browser context shared by page fetches.
+
+    Sharing one context lets navigations reuse its HTTP cache, cookies and
+    open connections. It is replaced after CONTEXT_MAX_PAGES pages; the old
+    context is closed once its last page is closed.
+
+    Returns:
+        A new page on the shared headless browser
+    """
+    global _fetch_context, _fetch_context_pages
+    browser = await get_browser(headless=True)
+    async with _fetch_context_lock:
+        if (
+            _fetch_context is None
+            or _fetch_context.browser is not browser
+            or _fetch_context_pages >= CONTEXT_MAX_PAGES
+        ):
+            previous = _fetch_context
+            _fetch_context = await browser.new_context(
+                user_agent=USER_AGENT, viewport={"width": 1280, "height": 800}
+            )
+            _fetch_context_pages = 0
+
+            # Skip downloading assets the extractors discard anyway
+            await block_resources(_fetch_context)
+
+            if previous is not None and not previous.pages:
+                await previous.close()
+        _fetch_context_pages += 1
+        return await _fetch_context.new_page()
+
+
+async def goto_and_settle(page: Page, url: str) -> None:
+    """Navigate to a URL and give the page a short, bounded time to settle.
+
+    Waiting for "networkidle" outright can stall until the navigation timeout
+    on pages with analytics beacons or long polling, so navigation only waits
+    for the DOM and idle network is treated as best-effort.
+
+    Args:
+        page: The page to navigate
+        url: The URL to navigate to
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-async def fetch_html(url: str) -> Optional[str]:
+    await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+    try:
+        await page.wait_for_load_state("networkidle", timeout=3000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def fetch_html(url: str, strip_non_content: bool = False) -> Optional[str]:
     """Fetch HTML content from a URL using Playwright.
 
     Args:
         url: The URL to fetch content from
+        strip_non_content: Remove scripts, styles and other elements that carry
+            no readable text before serializing the DOM
 
     Returns:
         The HTML content as a string, or None if an error occurred
     """
     try:
-        async with async_playwright() as p:
-            # Launch browser in headless mode
-            browser = await p.chromium.launch(headless=True)
-
-            # Create a new page
-            page = await browser.new_page()
-
-            # Navigate to the URL and wait until network is idle
-            await page.goto(url, wait_until="networkidle")
+        page = await new_fetch_page()
+        try:
+            # Navigate to the URL and let scripts render the content
+            await goto_and_settle(page, url)
 
             # Get the page content
-            html = await page.content()
-
-            # Close the browser
-            await browser.close()
-            return html
+            if strip_non_content:
+                return await page.evaluate(STRIPPED_CONTENT_JS)
+            return await page.content()
+        finally:
+            await page.close()
+
+            # Close a rotated-out context once its last page is done
+            context = page.context
+            if context is not _fetch_context and not context.pages:
+                await context.close()
     except Exception as e:
         print(f"Error fetching HTML: {e}", file=sys.stderr)
         return None
 
 
+async def fetch_static_html(url: str) -> Optional[str]:
+    """Fetch HTML content from a URL over plain HTTP, without a browser.
+
+    Args:
+        url: The URL to fetch content from
+
+    Returns:
+        The HTML content as a string, or None if the request failed or the
+        response is not HTML
+    """
+    try:
+        async with httpx.AsyncClient(
+            http2=True, follow_redirects=True, timeout=10
+        ) as client:
+            response = await client.get(url, headers={"User-Agent": USER_AGENT})
+            response.raise_for_status()
+    except (httpx.HTTPError, httpx.InvalidURL):
+        # Not an error yet: the caller falls back to the browser, which reports
+        # its own failure if that does not work either
+        return None
+
+    if "html" not in response.headers.get("content-type", ""):
+        return None
+    return response.text
+
+
+def static_page_text(html: str) -> Optional[str]:
+    """Extract the text of a statically fetched page if it needs no JavaScript.
+
+    Args:
+        html: The HTML content fetched without a browser
+
+    Returns:
+        The extracted text, or None if the page looks like a JavaScript shell
+        with little content and has to be rendered in a browser
+    """
+    if _JS_SHELL_RE.search(html):
+        return None
+    text = extract_text(html)
+    if not text or len(text) < MIN_STATIC_TEXT_LENGTH:
+        return None
+    return text
+
+
 def extract_text(html: str) -> Optional[str]:
-    """Extract readable text content from HTML using Trafilatura.
+    """Extract readable text content from HTML using Resiliparse.
 
     Args:
         html: The HTML content to extract text from
@@ -53,28 +279,92 @@ def extract_text(html: str) -> Optional[str]:
         The extracted text content as a string, or None if an error occurred
     """
     try:
-        # Use trafilatura to extract the main content from HTML
+        # Use resiliparse to extract the main content from HTML
         # This removes navigation, ads, and other non-content elements
-        return trafilatura.extract(html)
+        return extract_plain_text(html, main_content=True)
     except Exception as e:
         print(f"Error extracting text: {e}", file=sys.stderr)
         return None
 
 
+class FetchFailedError(Exception):
+    """Raised internally when a URL yields no content, so it is not cached."""
+
+
+_disk_cache = None
+if os.environ.get("FETCH_CACHE_DIR"):
+    if diskcache is not None:
+        _disk_cache = diskcache.Cache(os.environ["FETCH_CACHE_DIR"])
+    else:
+        print(
+            "FETCH_CACHE_DIR is set but diskcache is not installed; "
+            "install the 'cache' extra to enable the disk cache",
+            file=sys.stderr,
+        )
+
+
 async def fetch_content(
     url: str, output_type: Literal["html", "text", "md"] = "text"
 ) -> Optional[str]:
     """Fetch content from URL and return either HTML or extracted text.
 
+    A fetch taking longer than FETCH_TIMEOUT seconds is cancelled. Results are
+    cached in memory by URL and output type for CACHE_TTL seconds, and on disk as
+    well when FETCH_CACHE_DIR is set and diskcache is installed.
+
     Args:
         url: The URL to fetch content from
-        output_type: The type of content to return ('html' or 'text')
+        output_type: The type of content to return ('html', 'text' or 'md')
 
     Returns:
         The requested content as a string, or None if an error occurred
     """
-    # First, fetch the HTML content from the URL
-    html = await fetch_html(url)
+    try:
+        return await _fetch_content_cached(url, output_type)
+    except FetchFailedError:
+        return None
+
+
+@alru_cache(maxsize=256, ttl=CACHE_TTL)
+async def _fetch_content_cached(
+    url: str, output_type: Literal["html", "text", "md"]
+) -> str:
+    # Only memory misses reach the disk cache, and disk hits returned from here
+    # are kept in memory by alru_cache. diskcache is blocking SQLite, so it is
+    # run in a worker thread
+    key = f"{output_type}|{url}"
+    if _disk_cache is not None:
+        content = await asyncio.to_thread(_disk_cache.get, key)
+        if content is not None:
+            return content
+
+    # Failures raise instead of returning None so alru_cache does not keep them.
+    # The deadline is applied here rather than by callers: alru_cache shields
+    # this coroutine, so cancelling a caller would leave the fetch running
+    try:
+        content = await asyncio.wait_for(
+            _fetch_content(url, output_type), FETCH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        print(f"Timed out fetching {url}", file=sys.stderr)
+        raise FetchFailedError(url) from None
+    if not content:
+        raise FetchFailedError(url)
+
+    if _disk_cache is not None:
+        await asyncio.to_thread(_disk_cache.set, key, content, expire=CACHE_TTL)
+    return content
+
+
+async def _fetch_content(
+    url: str, output_type: Literal["html", "text", "md"]
+) -> Optional[str]:
+    # Try a plain HTTP request first and only render with a browser if needed.
+    # The text extracted to judge the static page is reused for text output
+    html = await fetch_static_html(url)
+    text = static_page_text(html) if html is not None else None
+    if text is None:
+        html = await fetch_html(url, strip_non_content=output_type != "html")
 
     if html is None:
         return None
@@ -83,15 +373,45 @@ async def fetch_content(
         case "html":
             return html
         case "text":
-            return trafilatura.extract(html)
+            return text or extract_text(html)
         case "md":
+            import trafilatura
+
             # Extract and return only the markdown content
             return trafilatura.extract(html, output_format="markdown")
         case _:
             raise ValueError(f"Invalid output type: {output_type}")
 
 
-@dataclass
+async def fetch_contents(
+    urls: list[str],
+    output_type: Literal["html", "text", "md"] = "text",
+    concurrency: int = 4,
+) -> list[Optional[str]]:
+    """Fetch content from several URLs concurrently.
+
+    Args:
+        urls: The URLs to fetch content from
+        output_type: The type of content to return ('html', 'text' or 'md')
+        concurrency: Maximum number of pages fetched at the same time
+
+    Returns:
+        The content for each URL in order, with None for failed fetches, including
+        those that took longer than FETCH_TIMEOUT seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(url: str) -> Optional[str]:
+        async with semaphore:
+            return await fetch_content(url, output_type)
+
+    contents = await asyncio.gather(
+        *(fetch_one(url) for url in urls), return_exceptions=True
+    )
+    return [None if isinstance(c, BaseException) else c for c in contents]
+
+
+@dataclass(slots=True, frozen=True)
 class SearchResult:
     url: str
     title: str
@@ -99,12 +419,134 @@ class SearchResult:
     date: Optional[str] = None
 
 
+# Collects the raw fields of the first N result cards in a single round-trip.
+# This returns a few KB, whereas page.content() followed by an in-process parse
+# would serialize and transfer the whole results page for the same data
+EXTRACT_RESULTS_JS = """
+(n) => Array.from(document.querySelectorAll("[data-testid='result']"))
+    .slice(0, n)
+    .map((r) => ({
+        url: r.querySelector("[data-testid='result-extras-url-link']")
+            ?.getAttribute("href"),
+        title: r.querySelector("[data-testid='result-title-a'] span")?.innerText,
+        description: r.querySelector(".kY2IgmnCmOGjharHErah")?.innerText,
+    }))
+"""
+
+
+def build_search_result(
+    url: Optional[str], title: Optional[str], desc_text: Optional[str]
+) -> Optional[SearchResult]:
+    """Build a SearchResult from the raw text of a DuckDuckGo result card.
+
+    Args:
+        url: The result link, possibly relative to duckduckgo.com
+        title: The result title
+        desc_text: The result snippet, which may contain a date
+
+    Returns:
+        A SearchResult, or None if the result has no URL
+    """
+    # If URL is relative, make it absolute
+    if url and url.startswith("/"):
+        url = f"https://duckduckgo.com{url}"
+    elif not url:
+        return None
+
+    title = title or "No title"
+    desc_text = desc_text or "No description"
+
+    # Try to extract date if present
+    date_match = _DATE_RE.search(desc_text)
+    date = date_match.group(1) if date_match else None
+
+    # Clean up description (remove date if found)
+    description = desc_text
+    if date:
+        description = description.replace(date, "").strip()
+
+    return SearchResult(url=url, title=title, description=description, date=date)
+
+
+def resolve_redirect_url(href: str) -> str:
+    """Unwrap a DuckDuckGo redirect link to the URL it points to.
+
+    Args:
+        href: A result link, possibly of the form //duckduckgo.com/l/?uddg=...
+
+    Returns:
+        The target URL
+    """
+    parsed = urllib.parse.urlparse(href)
+    if parsed.path == "/l/":
+        target = urllib.parse.parse_qs(parsed.query).get("uddg")
+        if target:
+            return target[0]
+    if href.startswith("//"):
+        return f"https:{href}"
+    return href
+
+
+async def search_html_endpoint(query: str, num_results: int = 4) -> list[SearchResult]:
+    """Search DuckDuckGo through its server-rendered HTML endpoint.
+
+    Args:
+        query: The search query
+        num_results: Number of results to extract
+
+    Returns:
+        List of SearchResult objects, empty if the request failed or DuckDuckGo
+        served no parseable results
+    """
+    if num_results <= 0:
+        return []
+
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=10) as client:
+            response = await client.get(
+                "https://html.duckduckgo.com/html/",
+                params={"q": query},
+                headers={"User-Agent": USER_AGENT},
+            )
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Error during HTML search: {e}", file=sys.stderr)
+        return []
+
+    results = []
+    for node in LexborHTMLParser(response.text).css(".result"):
+        # Skip sponsored results
+        if "result--ad" in (node.attributes.get("class") or ""):
+            continue
+
+        link = node.css_first(".result__a")
+        if link is None:
+            continue
+        href = link.attributes.get("href")
+        snippet = node.css_first(".result__snippet")
+
+        result = build_search_result(
+            resolve_redirect_url(href) if href else None,
+            link.text().strip(),
+            snippet.text().strip() if snippet else None,
+        )
+        if result:
+            results.append(result)
+            if len(results) >= num_results:
+                break
+
+    return results
+
+
 async def search_and_extract_results(
     query: str, num_results: int = 4
 ) -> list[SearchResult]:
     """
     Search DuckDuckGo for the given query and extract the first N search results.
 
+    The server-rendered HTML endpoint is tried first; a browser is only
+    launched if it yields no results.
+
     Args:
         query: The search query
         num_results: Number of results to extract
@@ -112,76 +554,63 @@ async def search_and_extract_results(
     Returns:
         List of SearchResult objects containing url, title, description and date
     """
-    # Encode the query for the URL
-    encoded_query = urllib.parse.quote_plus(query)
-    search_url = f"https://duckduckgo.com/?q={encoded_query}&t=h_"
+    if num_results <= 0:
+        return []
 
-    results = []
-    try:
-        async with async_playwright() as p:
-            # Launch browser
-            browser = await p.chromium.launch(headless=False)
-
-            # Create a new page
-            page = await browser.new_page()
+    results = await search_html_endpoint(query, num_results)
+    if results:
+        return results
+    return await search_with_browser(query, num_results)
 
-            # Navigate to the search URL
-            await page.goto(search_url, wait_until="networkidle")
 
-            # Wait for search results to load
-            await page.wait_for_selector("[data-testid='result']")
+async def search_with_browser(query: str, num_results: int = 4) -> list[SearchResult]:
+    """
+    Search DuckDuckGo in a browser and extract the first N search results.
 
-            # Extract the first N search results
-            result_elements = await page.query_selector_all("[data-testid='result']")
+    Args:
+        query: The search query
+        num_results: Number of results to extract
 
-            for i, result in enumerate(result_elements):
-                if i >= num_results:
-                    break
+    Returns:
+        List of SearchResult objects containing url, title, description and date
+    """
+    # Encode the query for the URL
+    search_url = str(
+        httpx.URL("https://duckduckgo.com/", params={"q": query, "t": "h_"})
+    )
 
-                # Extract URL
-                url_element = await result.query_selector(
-                    "[data-testid='result-extras-url-link']"
-                )
-                url = await url_element.get_attribute("href") if url_element else None
+    results = []
+    try:
+        # Launch (or reuse) a visible browser; DuckDuckGo blocks headless ones
+        browser = await get_browser(headless=False)
 
-                # If URL is relative, make it absolute
-                if url and url.startswith("/"):
-                    url = f"https://duckduckgo.com{url}"
-                elif not url:
-                    continue
+        # Create an isolated context for this search
+        context = await browser.new_context()
+        try:
+            # Keep stylesheets so result selectors still match
+            await block_resources(context, BLOCKED_RESOURCE_TYPES - {"stylesheet"})
 
-                # Extract title
-                title_element = await result.query_selector(
-                    "[data-testid='result-title-a'] span"
-                )
-                title = (
-                    await title_element.inner_text() if title_element else "No title"
-                )
+            page = await context.new_page()
 
-                # Extract description
-                desc_element = await result.query_selector(".kY2IgmnCmOGjharHErah")
-                desc_text = (
-                    await desc_element.inner_text()
-                    if desc_element
-                    else "No description"
-                )
+            # Navigate to the search URL
+            await page.goto(search_url, wait_until="domcontentloaded", timeout=15000)
 
-                # Try to extract date if present
-                date_match = re.search(r"(\w+ \d+, \d{4})", desc_text)
-                date = date_match.group(1) if date_match else None
+            # Wait for search results to load
+            await page.wait_for_selector("[data-testid='result']", timeout=10000)
 
-                # Clean up description (remove date if found)
-                description = desc_text
-                if date:
-                    description = description.replace(date, "").strip()
+            # Extract the first N search results inside the page
+            # Clamp the count, since a negative slice end would drop cards from
+            # the end instead of returning none
+            raw_results = await page.evaluate(EXTRACT_RESULTS_JS, max(num_results, 0))
 
-                results.append(
-                    SearchResult(
-                        url=url, title=title, description=description, date=date
-                    )
+            for raw in raw_results:
+                result = build_search_result(
+                    raw.get("url"), raw.get("title"), raw.get("description")
                 )
-
-            await browser.close()
+                if result:
+                    results.append(result)
+        finally:
+            await context.close()
 
     except Exception as e:
         print(f"Error during search: {e}", file=sys.stderr)
@@ -214,6 +643,27 @@ def parse_args():
     return parser.parse_args()
 
 
+def run_coroutine(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion on uvloop's event loop when available.
+
+    The loop is chosen here, by the entry points, rather than by installing a
+    global event loop policy when this module is imported.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
+
+
+async def run_with_cleanup(awaitable: Awaitable[T]) -> T:
+    """Await a coroutine and close shared browsers once it finishes."""
+    try:
+        return await awaitable
+    finally:
+        await close_browsers()
+
+
 def main():
     """Main entry point for the command line tool.
 
@@ -225,33 +675,38 @@ def main():
 
     if args.url:
         # Run the async fetch operation for a specific URL
-        result = asyncio.run(fetch_content(args.url, args.output))
+        result = run_coroutine(run_with_cleanup(fetch_content(args.url, args.output)))
 
-        # Output the result or report failure
+        # Output the result or report failure, writing the encoded bytes
+        # directly instead of going through print's text layer
         if result:
-            print(result)
+            sys.stdout.buffer.write(result.encode())
+            sys.stdout.buffer.write(b"\n")
         else:
             print(f"Failed to fetch content from {args.url}", file=sys.stderr)
             sys.exit(1)
     elif args.query:
         # Run the search operation
-        search_results = asyncio.run(
-            search_and_extract_results(args.query, args.results)
+        search_results = run_coroutine(
+            run_with_cleanup(search_and_extract_results(args.query, args.results))
         )
 
         if not search_results:
             print(f"No results found for query: {args.query}", file=sys.stderr)
             sys.exit(1)
 
-        # Print the search results
-        for i, result in enumerate(search_results, 1):
-            print(f"Result {i}:")
-            print(f"URL: {result.url}")
-            print(f"Title: {result.title}")
-            print(f"Description: {result.description}")
-            if result.date:
-                print(f"Date: {result.date}")
-            print()
+        # Print the search results in a single write
+        sys.stdout.write(
+            "".join(
+                f"Result {i}:\n"
+                f"URL: {result.url}\n"
+                f"Title: {result.title}\n"
+                f"Description: {result.description}\n"
+                + (f"Date: {result.date}\n" if result.date else "")
+                + "\n"
+                for i, result in enumerate(search_results, 1)
+            )
+        )
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+from dataclasses import asdict
 from typing import Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
@@ -6,9 +7,21 @@ from mcp.server.fastmcp import FastMCP
 # Import from the local main.py file using relative imports
 # This ensures it works both when run directly and as a module
 try:
-    from .main import fetch_content, search_and_extract_results
+    from .main import (
+        fetch_content,
+        fetch_contents,
+        run_coroutine,
+        run_with_cleanup,
+        search_and_extract_results,
+    )
 except ImportError:
-    from main import fetch_content, search_and_extract_results
+    from main import (
+        fetch_content,
+        fetch_contents,
+        run_coroutine,
+        run_with_cleanup,
+        search_and_extract_results,
+    )
 
 os.environ["PLAYWRIGHT_BROWSERS_PATH"] = ".playwright-browsers"
 
@@ -16,20 +29,22 @@ mcp = FastMCP("Web Search")
 
 
 @mcp.tool()
-async def search_internet(query: str, num_results: int = 8) -> List[Dict]:
+async def search_internet(
+    query: str, num_results: int = 8, fetch_bodies: bool = False
+) -> List[Dict]:
     """
     Search DuckDuckGo for the given query and return a list of results.
+
+    If fetch_bodies is true, each result also includes the markdown content of
+    its page under "content", fetched concurrently.
     """
     results = await search_and_extract_results(query, num_results)
-    return [
-        {
-            "url": r.url,
-            "title": r.title,
-            "description": r.description,
-            "date": r.date,
-        }
-        for r in results
-    ]
+    items = [asdict(r) for r in results]
+    if fetch_bodies:
+        contents = await fetch_contents([r.url for r in results], "md")
+        for item, content in zip(items, contents):
+            item["content"] = content
+    return items
 
 
 @mcp.tool()
@@ -52,4 +67,6 @@ async def fetch(url: str) -> Optional[str]:
 
 
 if __name__ == "__main__":
-    mcp.run()
+    # The browsers are shared by all sessions, so they are closed when the
+    # server exits rather than from the per-session lifespan
+    run_coroutine(run_with_cleanup(mcp.run_stdio_async()))